@@ -7,6 +7,10 @@ logging.basicConfig(
     format="%(asctime)s %(name)s %(levelname)s: %(message)s",
     datefmt="%d/%m/%Y %H:%M:%S",
 )
+# Not part of the log format, skip collecting them for every record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
 logger = logging.getLogger("__llm_gateway__")
 logger.setLevel(logging.INFO)
 start()
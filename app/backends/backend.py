@@ -1,9 +1,9 @@
 import os
 # Prevents tokenizers from using multiple threads
 os.environ['TOKENIZERS_PARALLELISM'] = 'false'
-from transformers import AutoTokenizer
 from transformers import LlamaTokenizerFast
 from typing import List, Tuple
+from functools import lru_cache
 import json
 import re
 import logging
@@ -13,51 +13,76 @@ logging.basicConfig(
     datefmt="%d/%m/%Y %H:%M:%S",
 )
 
+# - Only matches once, at the beggining of the string
+# - any characters or numbers of words followed by " : " or ": " or " :"
+SPEAKER_PATTERN = re.compile(r"^[A-Za-z0-9\s\-éèêëàâäôöùûüçïîÿæœñ]+ ?: ?", re.I)
+#sentence_endings = r"(?:\. |\.\.\. |\? |! |\.\.\.|\?\"|!\"|\?'|!'|¿ |¡ |« |» |· )"
+SENTENCE_ENDINGS = re.compile(r"((?:\. |\.\.\. |\? |! |\.\.\.|\?\"|!\"|\?'|!'|¿ |¡ |« |» |· )(?=[A-Z]))") #followed by capital letter ?
+
+# Flavor parameters copied onto the backend for each task
+FLAVOR_ATTRIBUTES = ('totalContextLength', 'maxGenerationLength', 'createNewTurnAfter', 'modelName', 'summaryTurns', 'maxNewTurns', 'top_p', 'temperature')
+
+# @TODO: Shall use the tokenizer from the model name / tokenizerclass
+# seems fine so far as it yields the same token count as the tokenizer from the mixed model
+DEFAULT_TOKENIZER = "hf-internal-testing/llama-tokenizer"
+
+@lru_cache(maxsize=None)
+def load_tokenizer(name: str):
+    # Loading from the hub (or local cache) is slow, do it once per process
+    return LlamaTokenizerFast.from_pretrained(name)
+
+@lru_cache(maxsize=128)
+def count_prompt_tokens(tokenizer_name: str, prompt: str) -> int:
+    # Prompt templates rarely change, avoid tokenizing the same one for every task
+    return len(load_tokenizer(tokenizer_name)(prompt, return_attention_mask=False)['input_ids'])
+
 class LLMBackend:
     def __init__(self, *args, **kwargs):
         self.logger = logging.getLogger("backend")
         self.logger.setLevel(logging.DEBUG)
+        # prompt template path -> (mtime, content)
+        self.prompts = {}
+
+    def warmup(self):
+        # Loads the shared tokenizer ahead of the first task
+        load_tokenizer(DEFAULT_TOKENIZER)
 
     def loadPrompt(self, service_name: str, fieldCount: int = 0):
-        self.logger.info(f"Loading prompt for service: {service_name}")
+        self.logger.info("Loading prompt for service: %s", service_name)
         self.promptFields = fieldCount
-        self.logger.info(f"Prompt fields: {self.promptFields}")
+        self.logger.info("Prompt fields: %s", self.promptFields)
         txt_filepath = f'../services/{service_name}.txt'
-        with open(txt_filepath, 'r') as f:
-            # prevent caching
-            os.fsync(f.fileno())
-            self.prompt = f.read()
+        # Templates are reloaded upon any usage, but only re-read when modified since last load
+        mtime = os.stat(txt_filepath).st_mtime_ns
+        cached = self.prompts.get(txt_filepath)
+        if cached is None or cached[0] != mtime:
+            with open(txt_filepath, 'r') as f:
+                cached = (mtime, f.read())
+            self.prompts[txt_filepath] = cached
+        self.prompt = cached[1]
             
     def setup(self, params: json, task_id: str):
-        self.logger.info(f"Setting up backend with params: {params} for task: {task_id}")
+        self.logger.info("Setting up backend with params: %s for task: %s", params, task_id)
         self.task_id = task_id
         try:
-            for attr in ['totalContextLength', 'maxGenerationLength', 'createNewTurnAfter', 'modelName', 'summaryTurns', 'maxNewTurns', 'top_p', 'temperature']:
+            for attr in FLAVOR_ATTRIBUTES:
                 setattr(self, attr, params[attr])
-            # @TODO: Shall use the tokenizer from the model name / tokenizerclass
-            # seems fine so far as it yields the same token count as the tokenizer from the mixed model
-            self.tokenizer =  LlamaTokenizerFast.from_pretrained("hf-internal-testing/llama-tokenizer")
-            self.promptTokenCount = len(self.tokenizer(self.prompt)['input_ids'])
+            self.tokenizer = load_tokenizer(DEFAULT_TOKENIZER)
+            self.promptTokenCount = count_prompt_tokens(DEFAULT_TOKENIZER, self.prompt)
             return True
         except Exception as e:
-            self.logger.error(f"Error setting up backend: {e}")
+            self.logger.error("Error setting up backend: %s", e)
             raise e
 
     def get_splits(self, content: str):
         lines = content.splitlines()
         speaker = "(?) : "
-        newTurns = []
-        # - Only matches once, at the beggining of the string
-        # - any characters or numbers of words followed by " : " or ": " or " :"
-        pattern = r"^[A-Za-z0-9\s\-éèêëàâäôöùûüçïîÿæœñ]+ ?: ?"
-        #sentence_endings = r"(?:\. |\.\.\. |\? |! |\.\.\.|\?\"|!\"|\?'|!'|¿ |¡ |« |» |· )"
-        sentence_endings = r"((?:\. |\.\.\. |\? |! |\.\.\.|\?\"|!\"|\?'|!'|¿ |¡ |« |» |· )(?=[A-Z]))" #followed by capital letter ?
+        turns = []
         # This loop ensures all new lines are related to the last speaker
         for line in lines:
             if line.strip() == "":
                 continue  # Skip empty lines
-            tokenCount = 0 
-            match = re.match(pattern, line, re.I)
+            match = SPEAKER_PATTERN.match(line)
             if match:
                 speaker = match.group(0)
             else:
@@ -65,12 +90,17 @@ class LLMBackend:
                     line = speaker + line
                 else:
                     line = "(?) : " + line
+            turns.append((speaker, line))
+        if not turns:
+            return []
 
-            tokens = self.tokenizer(line)['input_ids']
-            tokenCount += len(tokens)
-            if tokenCount > self.createNewTurnAfter:
+        # Tokenize every turn in one batch call, only the ids are counted
+        encodings = self.tokenizer([line for _, line in turns], return_attention_mask=False)['input_ids']
+        newTurns = []
+        for (speaker, line), tokens in zip(turns, encodings):
+            if len(tokens) > self.createNewTurnAfter:
                 # Split the line at the next sentence and create a new line
-                sentences = re.split(sentence_endings, line)
+                sentences = SENTENCE_ENDINGS.split(line)
                 for i, sentence in enumerate(sentences):
                     if sentence.strip() == "":
                         continue
@@ -78,14 +108,12 @@ class LLMBackend:
                         newTurns.append(sentence)
                     else:
                         newTurns.append(speaker + sentence)
-                tokenCount = 0  # Reset token count for the new line
             else:
-                if line.strip() != "":
-                    newTurns.append(line)
+                newTurns.append(line)
         return newTurns
     
     def updateTask(self, task_id: str, progress: int):
-        self.logger.info(f"Task {task_id} progress : {progress}%")
+        self.logger.info("Task %s progress : %s%%", task_id, progress)
         db.put(task_id, f"Processing {progress}%")
 
     def get_dialogs(self, chunks: List[Tuple[str, str]], max_new_speeches: int = -1) -> List[str]:
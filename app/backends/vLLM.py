@@ -8,8 +8,8 @@ class VLLM(LLMBackend):
         super().__init__(*args, **kwargs)
         self.api_key = kwargs.get('api_key')
         self.api_base = kwargs.get('api_base')
-        self.logger.info(f"API Key: {self.api_key}")
-        self.logger.info(f"API Base: {self.api_base}")
+        self.logger.info("API Key: %s", self.api_key)
+        self.logger.info("API Base: %s", self.api_base)
         self.client = OpenAI(api_key=self.api_key, base_url=self.api_base)
         
     def process_turns(self, summarized_turns, new_turns_to_summarize, i, turns):
@@ -75,5 +75,5 @@ class VLLM(LLMBackend):
             )
             return chat_response.choices[0].message.content
         except Exception as e:
-            self.logger.error(f"Error publishing: {e}")
+            self.logger.error("Error publishing: %s", e)
             return None
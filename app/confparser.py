@@ -41,6 +41,13 @@ def createParser() -> argparse.ArgumentParser:
         default=int(os.environ.get("CONCURRENCY", 1)) + 1,
     )
 
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="Number of threads per Gunicorn worker (default=1, sync workers)",
+        default=int(os.environ.get("THREADS", 1)),
+    )
+
     parser.add_argument(
         "--timeout",
         type=int,
@@ -2,7 +2,6 @@
 import json
 import threading
 import os
-import signal
 import re
 import logging
 from multiprocessing import Queue, Manager
@@ -24,8 +23,13 @@ logging.basicConfig(
 logger = logging.getLogger("http_server")
 logger.setLevel(logging.DEBUG)
 
+# Progress placeholder written by the backend while a task is running
+PROGRESS_PATTERN = re.compile(r'^Processing ([0-9]+(?:\.[0-9]+)?)%$')
+
 # App Setup
 flaskApp = Flask(__name__)
+# Key order carries no meaning for clients, skip sorting on every response
+flaskApp.json.sort_keys = False
 tasks = Queue()
 lock = Lock()
 parser = createParser()
@@ -51,60 +55,67 @@ def handleGeneration(service_name):
                 raise Exception("content")
             if not flavor:
                 raise Exception("flavor")
-            service = next((s for s in services if s['name'] == service_name), None)
+            # Keyed lookup, only this service's manifest crosses the manager round-trip
+            service = services.get(service_name)
             if service is None:
                 return jsonify({"message":"Service not found"}), 404
             backendParams = next((f for f in service['flavor'] if f['name'] == flavor), None)
+            if backendParams is None:
+                return jsonify({"message":"Flavor not found"}), 404
             # default temperature and top_p in flavor
             if temperature:
                 backendParams['temperature'] = float(temperature)
             if top_p:
+                top_p = float(top_p)
                 # must be between 0 and 1 or failsback to default
-                if 0 < float(top_p) <= 1:
-                    backendParams['top_p'] = float(top_p)
-            if backendParams is None:
-                return jsonify({"message":"Flavor not found"}), 404
+                if 0 < top_p <= 1:
+                    backendParams['top_p'] = top_p
             task_id = str(uuid.uuid4())
             # create task
             with lock:
                 tasks.put({"backend": service['backend'], "type": service['name'], "task_id": task_id, "backendParams":backendParams, "fields":service['fields'], "content": content})
-                logger.info(f"Task {task_id} queued")
+                logger.info("Task %s queued", task_id)
             db.put(task_id, "Processing 0%")
             return jsonify({"message":"request successfulty queued", "jobId":task_id}), 200
         except Exception as e:
             return  jsonify({"message": "Missing request parameter: {}".format(e)}), 400
     return flaskHandler
                 
+def conditional_response(payload):
+    # 200 only: a 304 stands in for a 200. Content may change between polls, so clients must revalidate
+    response = jsonify(payload)
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
 # Routes
 
 @flaskApp.route("/services", methods=["GET"])
 def summarization_info_route():
-    services_list = list(services)
-    return jsonify(services_list), 200
+    services_list = services.values()
+    return conditional_response(services_list)
 
 
 @flaskApp.route("/results/<resultId>", methods=["GET"])
 def get_result(resultId):
     try:
-        logger.info("Got get_result request: " + str(resultId))
+        logger.info("Got get_result request: %s", resultId)
         result = db.get(resultId)
         if result is None:
             return jsonify({"status":"nojob", "message":f"{resultId} does not exist"}), 404  
         else:
-            match = re.match(r'^Processing ([0-9]*\.[0-9]*)%$', result)
+            match = PROGRESS_PATTERN.match(result)
             if match:
                 processing_percentage = float(match.group(1))
                 if processing_percentage == 0:
                     return jsonify({"status":"queued", "message":result}), 202
                 else:
                     return jsonify({"status":"processing", "message":processing_percentage}), 202
-            elif result == "Processing 0%":
-                return jsonify({"status":"queued", "message":result}), 202
             else:
-                return jsonify({"status":"complete", "message":"success", 
-                                "summarization":result.strip()}), 200
+                return conditional_response({"status":"complete", "message":"success",
+                                "summarization":result.strip()})
     except Exception as e:
-        logger.error("An error occurred: " + str(e))
+        logger.error("An error occurred: %s", e)
         return jsonify({"status":"error", "message":str(e)}), 400 
     
 
@@ -133,36 +144,39 @@ def server_error(error):
 # Single threaded fifo task queue, fed by Guicorn workers
 def worker():
     logger.info("Starting task queue worker thread")
+    # Warm up here rather than at import, gunicorn workers never process tasks
+    for name, backend in backends.items():
+        try:
+            backend.warmup()
+        except Exception as e:
+            logger.warning("Could not warm up %s backend: %s", name, e)
     while True:
         try:
             task = tasks.get()
-            logger.info(f"Task {task['task_id']} processing started")
-            # setup backend to process task
+            logger.info("Task %s processing started", task['task_id'])
+            # setup backend to process task, backends maps manifest names to their singleton
             # @TODO: Implement other backends
-            if task["backend"] == "vLLM":
-                backend = backends["vLLM"]
+            backend = backends[task["backend"]]
             backend.loadPrompt(task["type"], task["fields"])
             backend.setup(task["backendParams"], task["task_id"])
             chunked_content = backend.get_splits(task["content"])
             summary = backend.get_generation(chunked_content)
-            #@TODO Might compare those
-            chunked_content_string = "\n".join(chunked_content)
             summary_string = "\n".join(summary)
             db.put(task["task_id"], summary_string)
-            logger.info(f"Task {task['task_id']} processing END")
+            logger.info("Task %s processing END", task['task_id'])
             if task is None:
                 break
             # check task parameters
         except Exception as e:
-            logger.error("An error occurred in processing tasks : " + str(e))
+            logger.error("An error occurred in processing tasks : %s", e)
             break
 
 def reload_services(fileName=None):
-    services[:] = []
+    services.clear()
     if fileName is None:
         logger.info("Loading service manifests")
     else:
-        logger.info(f"Reloading service routes: {fileName} has been modified")
+        logger.info("Reloading service routes: %s has been modified", fileName)
     for rule in list(flaskApp.url_map.iter_rules()):
         if str(rule).startswith('/services/'):
             flaskApp.url_map._rules.remove(rule)
@@ -173,13 +187,17 @@ def reload_services(fileName=None):
             try:
                 with open(f"../services/{service}", "r") as f:
                     service_info = json.load(f)
-                    services.append(service_info)
+                    if service_info['name'] in services:
+                        logger.error("Service not loaded: %s redefines service %s", service, service_info['name'])
+                        continue
                     flaskApp.add_url_rule(f"/services/{service_info['name']}/generate",
                                         endpoint=service_info['name'], 
                                         view_func=handleGeneration(service_info['name']), 
                                         methods=["POST"])
+                    # Only publish manifests whose route was registered
+                    services[service_info['name']] = service_info
             except Exception as e:
-                logger.error(f"Service not loaded: {e}")
+                logger.error("Service not loaded: %s", e)
         
 
 def start():
@@ -190,7 +208,7 @@ def start():
             setupSwaggerUI(flaskApp, args)
             logger.debug("Swagger UI set.")
     except Exception as e:
-        logger.warning("Could not setup swagger: {}".format(str(e)))
+        logger.warning("Could not setup swagger: %s", e)
 
 
     logger.info(args)
@@ -200,15 +218,17 @@ def start():
             "preload_app": True,
             "bind": f"0.0.0.0:{args.service_port}",
             "workers": args.workers,
+            # threads > 1 switches gunicorn to gthread workers
+            "threads": args.threads,
             "timeout": args.timeout
         },
     )
     
     try:
         global manager, services
-        # Services list in shared memory
+        # Services manifests in shared memory, keyed by service name
         manager = Manager()
-        services = manager.list()
+        services = manager.dict()
         event_handler = FileChangeHandler('.json', reload_services)
         observer = Observer()
         observer.schedule(event_handler, path='../services', recursive=False)
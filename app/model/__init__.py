@@ -1,34 +1,61 @@
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
 
 class Database:
     def __init__(self, db_path='/tmp/resultDB.sqlite'):
         self.db_path = db_path
+        # Process that created the database, i.e. the preloaded gunicorn master that forks workers
+        self._owner_pid = os.getpid()
+        # One connection per thread in gunicorn workers, opened on first use and then reused
+        self._local = threading.local()
         self.init_db()
 
-    def get_conn(self):
+    def connect(self):
         conn = sqlite3.connect(self.db_path)
+        # Safe with WAL, skips an fsync on every progress update
+        conn.execute('PRAGMA synchronous=NORMAL')
         return conn
 
+    @contextmanager
+    def get_conn(self):
+        # The master forks (and re-forks) gunicorn workers at any time, and every child
+        # would inherit any connection kept open here, including the task worker thread's.
+        # SQLite connections must not cross fork(), so the master only uses short-lived ones.
+        if os.getpid() == self._owner_pid:
+            conn = self.connect()
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+        yield conn
+
     def init_db(self):
-        conn = self.get_conn()
+        conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        # Persistent on the file: /results readers no longer block the task worker writing progress
+        cursor.execute('PRAGMA journal_mode=WAL')
         cursor.execute('''CREATE TABLE IF NOT EXISTS results
                                (task_id text primary key, result text)''')
         conn.commit()
         conn.close()
 
     def put(self, task_id, result):
-        conn = self.get_conn()
-        cursor = conn.cursor()
-        cursor.execute("INSERT OR REPLACE INTO results VALUES (?,?)", 
-                            (str(task_id), str(result)))
-        conn.commit()
-        conn.close()
+        with self.get_conn() as conn:
+            # Commits on success, rolls back on error so a reused connection is never left mid-transaction
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO results VALUES (?,?)",
+                                    (str(task_id), str(result)))
 
     def get(self, task_id):
-        conn = self.get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT result FROM results WHERE task_id=?", (str(task_id),))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else None
\ No newline at end of file
+        with self.get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT result FROM results WHERE task_id=?", (str(task_id),))
+            result = cursor.fetchone()
+        return result[0] if result else None